@@ -1,15 +1,28 @@
 import streamlit as st
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+import lxml.html
+from lxml import etree
+from urllib.parse import urljoin, urlparse, urlsplit
+from functools import lru_cache
 import re
-import pandas as pd
+try:
+    # RE2 matches in linear time, so near-miss '@' runs can't backtrack
+    import re2
+except ImportError:
+    re2 = None
+import pyarrow as pa
 import concurrent.futures
 import time
+import csv
+import io
+import ssl
 
 # ---------------- CONFIG & UTILS ---------------- #
 
-EMAIL_REGEX = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
+# Bytes pattern: addresses are ASCII, see extract_emails
+EMAIL_REGEX = rb"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
 
 OBFUSCATED_PATTERNS = [
     (r"\s*\[at\]\s*", "@"),
@@ -20,11 +33,39 @@ OBFUSCATED_PATTERNS = [
     (r"\s+dot\s+", "."),
 ]
 
+# Minimum gap between live results table redraws
+TABLE_REFRESH_SECONDS = 0.25
+RESULT_SCHEMA = pa.schema([
+    ("Email", pa.string()),
+    ("Page URL", pa.string()),
+    ("Page Title", pa.string()),
+])
+
+def compile_bytes_pattern(pattern):
+    # Bytes scans go through RE2 when it's installed. Latin-1 mode makes
+    # \xNN mean that single byte, as it does in re, rather than a UTF-8
+    # encoded code point.
+    if re2 is None:
+        return re.compile(pattern)
+    options = re2.Options()
+    options.encoding = re2.Options.Encoding.LATIN1
+    return re2.compile(pattern, options)
+
+# Compiled once at import instead of on every page
+EMAIL_RE = compile_bytes_pattern(EMAIL_REGEX)
+# All obfuscation patterns fused into one alternation (one group per
+# pattern) so the page text is scanned and rebuilt once instead of six times.
+# Kept on re: its \s also matches Unicode whitespace such as U+00A0 (&nbsp;),
+# and RE2's sub() with a callable is slower on str.
+OBFUSCATED_RE = re.compile(
+    "|".join(f"({pattern})" for pattern, _ in OBFUSCATED_PATTERNS), re.IGNORECASE
+)
+
+def _obfuscation_replacement(match):
+    return OBFUSCATED_PATTERNS[match.lastindex - 1][1]
+
 def normalize_text(text):
-    text = text.lower()
-    for pattern, replacement in OBFUSCATED_PATTERNS:
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-    return text
+    return OBFUSCATED_RE.sub(_obfuscation_replacement, text.lower())
 
 # --- NEW FUNCTION: Decode Cloudflare Emails ---
 def decode_cf_email(cf_email):
@@ -39,47 +80,170 @@ def decode_cf_email(cf_email):
     return email
 
 def extract_emails(text):
-    return set(re.findall(EMAIL_REGEX, text))
+    # Scan a one-byte-per-char ASCII copy; "replace" turns every other
+    # character into '?', which can't be part of an address
+    data = text.encode("ascii", "replace")
+    return {email.decode("ascii") for email in EMAIL_RE.findall(data)}
+
+def is_internal_link(link, base_prefixes):
+    # Links come from clean_link, so they are absolute with at least a "/" path
+    return link.startswith(base_prefixes)
 
-def is_internal_link(link, base_domain):
-    parsed = urlparse(link)
-    return parsed.netloc == "" or parsed.netloc == base_domain
+@lru_cache(maxsize=4096)
+def clean_link(href, base_url):
+    # Resolve and drop ;params/queries/fragments for better crawling. Cached
+    # because nav bars repeat the same hrefs on every page.
+    parsed = urlsplit(urljoin(base_url, href))
+    path = parsed.path.split(";", 1)[0] or "/"
+    return f"{parsed.scheme}://{parsed.netloc}{path}"
 
 # ---------------- CRAWLER LOGIC ---------------- #
 
+class SharedSSLContextAdapter(HTTPAdapter):
+    # Certificates aren't verified (the crawl uses verify=False), so build one
+    # context up front; otherwise urllib3 creates a context and loads the CA
+    # bundle again for every new HTTPS connection
+    def __init__(self, *args, **kwargs):
+        self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        self.ssl_context.check_hostname = False
+        self.ssl_context.verify_mode = ssl.CERT_NONE
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["ssl_context"] = self.ssl_context
+        super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        # Pools behind HTTPS_PROXY/HTTP_PROXY are built here, not in init_poolmanager
+        proxy_kwargs["ssl_context"] = self.ssl_context
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+# Compiled XPath queries; plain strings so results don't keep the tree alive
+CF_EMAILS_XPATH = etree.XPath("//@data-cfemail", smart_strings=False)
+HREFS_XPATH = etree.XPath("//a/@href", smart_strings=False)
+SCRIPT_STYLE_XPATH = etree.XPath("//script|//style")
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+# Links to obvious non-page files are never requested
+SKIPPED_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico",
+    ".zip", ".rar", ".gz", ".mp3", ".mp4", ".avi", ".mov", ".css", ".js",
+)
+# Upper bound on page text scanned for addresses; keeps huge archive or
+# sitemap-style pages from dominating a worker
+MAX_TEXT_CHARS = 1_000_000
+# Bytes handed to the parser per network read
+CHUNK_SIZE = 32 * 1024
+# Skipped responses up to this size are read so their connection stays pooled
+DRAIN_LIMIT = 64 * 1024
+# Cheap byte-level test for anything the email passes below could match:
+# a literal or entity-encoded '@', a Cloudflare-protected address, or an
+# obfuscated "at", including one next to a UTF-8 or Latin-1 no-break space
+# (OBFUSCATED_RE always uses re, whose \s matches U+00A0). Pages without any
+# of these skip email extraction.
+MAYBE_EMAIL_RE = compile_bytes_pattern(rb"(?i)@|&#0*64;|&#x0*40;|&commat;|data-cfemail|\[at\]|\(at\)|[\s;>\xa0]at[\s&<\xc2\xa0]")
+# Longest marker above, carried between chunks so none is split unseen
+MARKER_OVERLAP = len(b"data-cfemail")
+
+def header_charset(content_type):
+    # charset= parameter of a Content-Type header, or None when absent
+    for param in content_type.split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "charset":
+            return value.strip().strip("\"'") or None
+    return None
+
+def make_parser(charset):
+    # A charset from the HTTP header wins over <meta>, as response.text did;
+    # without one (or with one lxml doesn't know) lxml sniffs the <meta> tag
+    if charset:
+        try:
+            return lxml.html.HTMLParser(encoding=charset)
+        except LookupError:
+            pass
+    return lxml.html.HTMLParser()
+
+def find_emails(tree, hrefs):
+    found_emails = set()
+
+    # 1. CLOUDFLARE DECODING (New Logic)
+    # Cloudflare hides emails in 'data-cfemail' attribute
+    for cf_email in CF_EMAILS_XPATH(tree):
+        decoded = decode_cf_email(cf_email)
+        if decoded:
+            found_emails.add(decoded)
+
+    # 2. MAILTO EXTRACTION (New Logic)
+    # Check all links that start with 'mailto:'
+    for href in hrefs:
+        if href.lower().startswith('mailto:'):
+            # Clean up the mailto string (remove ?subject= etc)
+            possible_email = href.split(':')[1].split('?')[0]
+            if EMAIL_RE.match(possible_email.encode("ascii", "replace")):
+                found_emails.add(possible_email)
+
+    # 3. STANDARD TEXT EXTRACTION (Old Logic)
+    # Script/style bodies aren't visible text. drop_tree keeps their tails but
+    # glues each onto the preceding text, so pad it with a space first.
+    for element in SCRIPT_STYLE_XPATH(tree):
+        element.tail = " " + (element.tail or "")
+        element.drop_tree()
+    # Stop collecting text once past the cap instead of joining it all
+    text_parts = []
+    text_size = 0
+    for text in tree.itertext():
+        text_parts.append(text)
+        text_size += len(text) + 1
+        if text_size > MAX_TEXT_CHARS:
+            break
+    page_text = " ".join(text_parts)
+    if len(page_text) > MAX_TEXT_CHARS:
+        # Cut at whitespace so an address isn't truncated into a bogus one
+        cut = max(page_text.rfind(space, 0, MAX_TEXT_CHARS + 1) for space in " \t\r\n")
+        page_text = page_text[:max(cut, 0)]
+    normalized_text = normalize_text(page_text)
+    text_emails = extract_emails(normalized_text)
+    found_emails.update(text_emails)
+    return found_emails
+
+def drain_short_body(response):
+    # Leaving an unread streamed response closes its socket; reading a small
+    # body instead lets the connection go back to the pool for reuse
+    length = response.headers.get("Content-Length", "")
+    if length.isdigit() and int(length) <= DRAIN_LIMIT:
+        response.content
+
 def crawl_page(url, session, timeout):
     try:
-        response = session.get(url, timeout=timeout, verify=False)
-        if response.status_code != 200:
-            return [], []
-        
-        final_url = response.url
-        soup = BeautifulSoup(response.text, "lxml")
-        title = soup.title.string.strip() if soup.title else "N/A"
+        with session.get(url, timeout=timeout, verify=False, stream=True) as response:
+            if response.status_code != 200:
+                drain_short_body(response)
+                return [], []
+            # Decided from headers alone; large bodies are never downloaded
+            content_type_header = response.headers.get("Content-Type", "")
+            content_type = content_type_header.split(";")[0].strip().lower()
+            if content_type and content_type not in HTML_CONTENT_TYPES:
+                drain_short_body(response)
+                return [], []
+
+            final_url = response.url
+            # Feed raw bytes to lxml as they arrive so parsing overlaps the
+            # download and the full body is never held as one decoded string
+            parser = make_parser(header_charset(content_type_header))
+            may_have_emails = False
+            previous_tail = b""
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                parser.feed(chunk)
+                if not may_have_emails:
+                    may_have_emails = MAYBE_EMAIL_RE.search(previous_tail + chunk) is not None
+                    previous_tail = chunk[-MARKER_OVERLAP:]
+            tree = parser.close()
+            if tree is None:
+                return [], []
+
+        title = (tree.findtext(".//title") or "").strip() or "N/A"
         
-        found_emails = set()
-
-        # 1. CLOUDFLARE DECODING (New Logic)
-        # Cloudflare hides emails in 'data-cfemail' attribute
-        for cf in soup.find_all(attrs={"data-cfemail": True}):
-            decoded = decode_cf_email(cf['data-cfemail'])
-            if decoded:
-                found_emails.add(decoded)
-
-        # 2. MAILTO EXTRACTION (New Logic)
-        # Check all links that start with 'mailto:'
-        for a in soup.find_all('a', href=True):
-            if a['href'].lower().startswith('mailto:'):
-                # Clean up the mailto string (remove ?subject= etc)
-                possible_email = a['href'].split(':')[1].split('?')[0]
-                if re.match(EMAIL_REGEX, possible_email):
-                    found_emails.add(possible_email)
-
-        # 3. STANDARD TEXT EXTRACTION (Old Logic)
-        page_text = soup.get_text(" ", strip=True)
-        normalized_text = normalize_text(page_text)
-        text_emails = extract_emails(normalized_text)
-        found_emails.update(text_emails)
+        hrefs = HREFS_XPATH(tree)
+        found_emails = find_emails(tree, hrefs) if may_have_emails else set()
         
         # Prepare Data
         found_data = []
@@ -92,13 +256,15 @@ def crawl_page(url, session, timeout):
                     "Page Title": title
                 })
             
-        links = set()
-        for tag in soup.find_all("a", href=True):
-            link = urljoin(final_url, tag["href"])
-            parsed = urlparse(link)
-            # Remove queries/fragments for better crawling
-            clean_link = parsed.scheme + "://" + parsed.netloc + parsed.path
-            links.add(clean_link)
+        # Root-relative and absolute hrefs resolve the same from every page,
+        # so key them on the origin and let the cache hit across pages
+        parsed = urlsplit(final_url)
+        origin = f"{parsed.scheme}://{parsed.netloc}/"
+        links = {
+            clean_link(href, origin if href.startswith(("/", "http://", "https://")) else final_url)
+            for href in hrefs
+        }
+        links = {link for link in links if not link.lower().endswith(SKIPPED_EXTENSIONS)}
             
         return found_data, links
 
@@ -131,6 +297,7 @@ if st.button("🚀 Start Fast Crawl", type="primary"):
 
     # Setup
     base_domain = urlparse(start_url).netloc
+    base_prefixes = (f"http://{base_domain}/", f"https://{base_domain}/")
     visited_urls = set([start_url])
     
     all_emails = []       
@@ -147,12 +314,32 @@ if st.button("🚀 Start Fast Crawl", type="primary"):
     
     st.write("### 👀 Live Results (Unique)")
     live_table = st.empty()
+    # Rows already shown live; new rows are appended as a delta on redraw.
+    # Streamlit takes the Arrow table as-is, skipping a pandas conversion.
+    results_table = RESULT_SCHEMA.empty_table()
+    last_table_update = time.monotonic()
+    # Rows are written out as they're found, so the download is ready at the end
+    csv_file = io.TextIOWrapper(io.BytesIO(), encoding="utf-8", newline="")
+    csv_writer = csv.DictWriter(csv_file, fieldnames=RESULT_SCHEMA.names)
+    csv_writer.writeheader()
     
     requests.packages.urllib3.disable_warnings()
     session = requests.Session()
+    # Keep one pooled keep-alive connection per worker; with the default pool
+    # of 10, extra threads would open and discard a fresh TCP/TLS connection
+    # on every request
+    adapter = SharedSSLContextAdapter(
+        pool_connections=workers,
+        pool_maxsize=workers,
+        max_retries=Retry(total=1, backoff_factor=0.1),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
     # Headers zaruri hain taaki bot detection kam ho
     session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
     })
 
     pages_scanned = 0
@@ -176,17 +363,15 @@ if st.button("🚀 Start Fast Crawl", type="primary"):
                     
                     if data:
                         if remove_duplicates:
-                            for item in data:
-                                email = item['Email']
-                                if email not in seen_emails:
-                                    seen_emails.add(email)
-                                    all_emails.append(item)
-                        else:
-                            all_emails.extend(data)
+                            new_emails = {item['Email'] for item in data} - seen_emails
+                            seen_emails |= new_emails
+                            data = [item for item in data if item['Email'] in new_emails]
+                        all_emails.extend(data)
+                        csv_writer.writerows(data)
                     
                     if pages_scanned + len(future_to_url) < max_pages:
                         for link in links:
-                            if is_internal_link(link, base_domain) and link not in visited_urls:
+                            if is_internal_link(link, base_prefixes) and link not in visited_urls:
                                 visited_urls.add(link)
                                 new_future = executor.submit(crawl_page, link, session, timeout)
                                 future_to_url[new_future] = link
@@ -204,14 +389,23 @@ if st.button("🚀 Start Fast Crawl", type="primary"):
                     metric_pages.metric("Pages Scanned", pages_scanned)
                     metric_time.metric("Time Taken", f"{elapsed:.1f}s")
                     metric_emails.metric("Emails Found", len(all_emails))
-                    
-                    if all_emails:
-                        live_table.dataframe(pd.DataFrame(all_emails), height=300, use_container_width=True)
+
+                if len(all_emails) > results_table.num_rows and time.monotonic() - last_table_update > TABLE_REFRESH_SECONDS:
+                    new_rows = pa.Table.from_pylist(all_emails[results_table.num_rows:], schema=RESULT_SCHEMA)
+                    results_table = pa.concat_tables([results_table, new_rows])
+                    live_table.dataframe(results_table, height=300, use_container_width=True)
+                    last_table_update = time.monotonic()
 
             if pages_scanned >= max_pages:
                 for f in future_to_url: f.cancel()
                 break
 
+    # Flush rows that arrived after the last throttled redraw
+    if len(all_emails) > results_table.num_rows:
+        new_rows = pa.Table.from_pylist(all_emails[results_table.num_rows:], schema=RESULT_SCHEMA)
+        results_table = pa.concat_tables([results_table, new_rows])
+        live_table.dataframe(results_table, height=300, use_container_width=True)
+
     end_time = time.time()
     duration = round(end_time - start_time, 2)
     
@@ -219,9 +413,9 @@ if st.button("🚀 Start Fast Crawl", type="primary"):
     status_text.success(f"✅ Finished! Scanned {pages_scanned} pages in {duration} seconds.")
 
     if all_emails:
-        df = pd.DataFrame(all_emails)
-        csv = df.to_csv(index=False).encode('utf-8')
-        st.download_button("⬇️ Download CSV", csv, f"emails_{base_domain}.csv", "text/csv")
+        csv_file.flush()
+        csv_bytes = csv_file.buffer.getvalue()
+        st.download_button("⬇️ Download CSV", csv_bytes, f"emails_{base_domain}.csv", "text/csv")
     else:
         st.warning("No emails found.")
 